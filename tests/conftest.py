@@ -0,0 +1,20 @@
+"""
+Shared pytest setup: configure Django so the api app can be imported.
+"""
+
+import os
+import sys
+
+import django
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# INSTALLED_APPS and the URLconf refer to the app as "api". Putting
+# transcription_service/ on sys.path would let its celery.py shadow the celery
+# package, so register the package under that name instead.
+import transcription_service.api  # noqa: E402
+
+sys.modules.setdefault('api', transcription_service.api)
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'transcription_service.settings')
+django.setup()
@@ -0,0 +1,102 @@
+"""
+Tests for TranscriptAnalyzer theme categorization and short summaries.
+"""
+
+import pytest
+
+from api.analyzer import TranscriptAnalyzer
+
+
+def baseline_categorize(transcript_text):
+    """
+    Original substring-based categorization the keyword regex replaced.
+    Kept here as the reference the analyzer must keep matching.
+    """
+    themes = {key: [] for key in TranscriptAnalyzer().themes}
+    for sentence in [s.strip() for s in transcript_text.split('.') if s.strip()]:
+        sentence_lower = sentence.lower()
+
+        if any(keyword in sentence_lower for keyword in ['education', 'school', 'college', 'program']):
+            if 'dropout' in sentence_lower or 'drop out' in sentence_lower:
+                themes["Student Dropout Rates"].append(sentence)
+            else:
+                themes["Education vs Experience"].append(sentence)
+        elif any(keyword in sentence_lower for keyword in ['flat rate', 'compensation', 'pay', 'salary', 'wage']):
+            themes["Industry Compensation"].append(sentence)
+        elif any(keyword in sentence_lower for keyword in ['hands on', 'hands-on', 'practice', 'lab', 'vehicle']):
+            themes["Hands-on Training"].append(sentence)
+        elif any(keyword in sentence_lower for keyword in ['assessment', 'test', 'certification', 'grade', 'gpa']):
+            themes["Assessment and Certification"].append(sentence)
+        elif any(keyword in sentence_lower for keyword in ['employer', 'dealership', 'shop', 'hire', 'hiring']):
+            themes["Employer Expectations"].append(sentence)
+        elif any(keyword in sentence_lower for keyword in ['equipment', 'tools', 'resources', 'budget']):
+            themes["Resources and Equipment"].append(sentence)
+        elif any(keyword in sentence_lower for keyword in ['graduate', 'job', 'placement', 'career']):
+            themes["Job Placement"].append(sentence)
+
+    return themes
+
+
+SAMPLE_TRANSCRIPT = """
+    The automotive education program faces challenges with student dropout rates around 30%.
+    Many students struggle with hands-on training due to limited equipment resources.
+    Employers expect graduates to have practical experience, but schools lack sufficient vehicles.
+    The flat rate compensation system makes it difficult to attract new technicians.
+    Assessment and certification standards need improvement to better demonstrate student capabilities.
+"""
+
+
+@pytest.mark.parametrize('transcript', [
+    SAMPLE_TRANSCRIPT,
+    # Keywords match inside longer words, as the substring checks did
+    "The label was wrong. We had to repay it. The latest numbers. A workshop downtown. A jobless summer.",
+    # The first matching theme wins, whatever order the keywords appear in
+    "Your pay after college is low. The test in the lab went well. Hiring for the job fair.",
+    # Matching ignores case, and dropout only matters for education sentences
+    "SCHOOL DROP OUT numbers. Dropout pay. Drop Out of the program.",
+    # Sentences without keywords, empty sentences and whitespace are skipped
+    "Nothing relevant here... Just chatting.  .",
+    "",
+])
+def test_categorize_matches_baseline(transcript):
+    themes = TranscriptAnalyzer().categorize(transcript)
+
+    assert themes == baseline_categorize(transcript)
+
+
+def test_categorize_returns_fresh_themes_each_call():
+    analyzer = TranscriptAnalyzer()
+    first = analyzer.categorize("The school program.")
+    second = analyzer.categorize("The salary.")
+
+    assert first["Education vs Experience"] == ["The school program"]
+    assert second["Education vs Experience"] == []
+    assert second["Industry Compensation"] == ["The salary"]
+
+
+def test_get_short_summary_without_topics():
+    analyzer = TranscriptAnalyzer()
+
+    assert analyzer.get_short_summary(None) == "No significant topics identified"
+    assert analyzer.get_short_summary(themes=analyzer.categorize("Just chatting.")) == "No significant topics identified"
+
+
+def test_get_short_summary_format():
+    analyzer = TranscriptAnalyzer()
+    short = analyzer.get_short_summary(themes=analyzer.categorize(SAMPLE_TRANSCRIPT))
+
+    assert short == (
+        "Topics: Education vs Experience, Student Dropout Rates, Industry Compensation (+2 more)"
+        "\n\nKey Insights:\n"
+        "1. Discussion includes formal education and its role in professional development\n"
+        "2. Student retention and dropout rates are significant concerns\n"
+        "3. Compensation models and payment structures are discussed\n"
+    )
+
+
+def test_get_short_summary_same_for_themes_and_summary():
+    analyzer = TranscriptAnalyzer()
+    from_summary = analyzer.get_short_summary(analyzer.analyze(SAMPLE_TRANSCRIPT))
+    from_themes = analyzer.get_short_summary(themes=analyzer.categorize(SAMPLE_TRANSCRIPT))
+
+    assert from_summary == from_themes
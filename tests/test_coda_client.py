@@ -0,0 +1,75 @@
+"""
+Tests for CodaTranscriptionClient error handling, with the codaio table mocked.
+"""
+
+import pytest
+from codaio import err
+
+from api.coda_client import CodaTranscriptionClient
+
+
+class FakeTable:
+    """codaio Table stub that raises the given error or records row updates."""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.updates = []
+
+    def get_row_by_id(self, row_id):
+        if self.error:
+            raise self.error
+        return row_id
+
+    def update_row(self, row, cells):
+        if self.error:
+            raise self.error
+        self.updates.append((row, {cell.column_id_or_name: cell.value for cell in cells}))
+
+
+def make_client(table):
+    """Build a client around a fake table without contacting Coda."""
+    client = CodaTranscriptionClient.__new__(CodaTranscriptionClient)
+    client.table = table
+    client.col_status = 'Status'
+    client.col_transcript = 'Transcript'
+    client.col_summary = 'Summary'
+    client.col_processed_date = 'Processed Date'
+    return client
+
+
+def test_get_row_returns_none_when_missing():
+    client = make_client(FakeTable(err.NotFound('Status code: 404')))
+
+    assert client.get_row('i-1') is None
+
+
+def test_get_row_raises_other_errors():
+    client = make_client(FakeTable(err.CodaError('Status code: 503')))
+
+    # Transient failures propagate so the task is retried instead of dropped
+    with pytest.raises(err.CodaError):
+        client.get_row('i-1')
+
+
+def test_update_row_with_results_writes_by_row_id():
+    table = FakeTable()
+
+    assert make_client(table).update_row_with_results('i-1', 'text', 'summary')
+    assert table.updates[0][0] == 'i-1'
+    assert table.updates[0][1]['Transcript'] == 'text'
+    assert table.updates[0][1]['Summary'] == 'summary'
+
+
+def test_mark_row_as_failed_reports_error():
+    table = FakeTable()
+
+    assert make_client(table).mark_row_as_failed('i-1', 'boom')
+    assert table.updates[0][1]['Status'] == 'Failed'
+    assert table.updates[0][1]['Summary'] == 'ERROR: boom'
+
+
+def test_update_failures_return_false():
+    client = make_client(FakeTable(err.CodaError('Status code: 429')))
+
+    assert client.update_row_with_results('i-1', 'text', 'summary') is False
+    assert client.mark_row_as_failed('i-1', 'boom') is False
@@ -0,0 +1,123 @@
+"""
+Tests for the transcription webhook, with Redis and Celery mocked out.
+"""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+import redis
+from django.test import Client
+
+from api import views
+
+WEBHOOK_URL = '/api/webhook/transcribe/'
+
+
+class FakePipeline:
+    """Redis pipeline stub returning the given lengths for queues and the unacked hash."""
+
+    def __init__(self, lengths):
+        self.lengths = lengths
+        self.keys = []
+
+    def llen(self, key):
+        self.keys.append(key)
+
+    def hlen(self, key):
+        self.keys.append(key)
+
+    def execute(self):
+        return [self.lengths.get(key, 0) for key in self.keys]
+
+
+@pytest.fixture
+def queued(monkeypatch):
+    """Replace queue_transcription and record the calls made to it."""
+    calls = []
+
+    def fake_queue_transcription(row_id, audio_url=None, language=None):
+        calls.append((row_id, audio_url, language))
+        return SimpleNamespace(id='task-1')
+
+    monkeypatch.setattr(views, 'queue_transcription', fake_queue_transcription)
+    monkeypatch.setattr(views, '_WEBHOOK_SECRET', b'')
+    monkeypatch.setattr(views.settings, 'MAX_INFLIGHT', 0)
+    return calls
+
+
+def post(body, **headers):
+    data = body if isinstance(body, str) else json.dumps(body)
+    return Client().post(WEBHOOK_URL, data=data, content_type='application/json', headers=headers)
+
+
+def test_queues_transcription(queued):
+    response = post({'row_id': 'i-1', 'audio_url': 'https://drive.google.com/file/d/abc', 'language': 'en'})
+
+    assert response.status_code == 202
+    assert response.json()['task_id'] == 'task-1'
+    assert queued == [('i-1', 'https://drive.google.com/file/d/abc', 'en')]
+
+
+@pytest.mark.parametrize('secret', [None, 'wrong'])
+def test_rejects_invalid_secret(queued, monkeypatch, secret):
+    monkeypatch.setattr(views, '_WEBHOOK_SECRET', b'expected')
+    headers = {'X-Webhook-Secret': secret} if secret else {}
+
+    response = post({'row_id': 'i-1'}, **headers)
+
+    assert response.status_code == 401
+    assert queued == []
+
+
+def test_accepts_valid_secret(queued, monkeypatch):
+    monkeypatch.setattr(views, '_WEBHOOK_SECRET', b'expected')
+
+    response = post({'row_id': 'i-1'}, **{'X-Webhook-Secret': 'expected'})
+
+    assert response.status_code == 202
+
+
+@pytest.mark.parametrize('body', ['not json', '["i-1"]', '"i-1"', '{}', '{"row_id": ""}'])
+def test_rejects_bad_body(queued, body):
+    response = post(body)
+
+    assert response.status_code == 400
+    assert queued == []
+
+
+def test_sheds_load_when_backed_up(queued, monkeypatch):
+    monkeypatch.setattr(views.settings, 'MAX_INFLIGHT', 5)
+    # Reserved (unacked) messages count towards the limit along with queued ones
+    pipeline = FakePipeline({'cpu': 2, 'gpu': 1, views._UNACKED_KEY: 2})
+    monkeypatch.setattr(views, '_BROKER', SimpleNamespace(pipeline=lambda transaction: pipeline))
+
+    response = post({'row_id': 'i-1'})
+
+    assert response.status_code == 429
+    assert response['Retry-After'] == '30'
+    assert queued == []
+
+
+def test_queues_below_inflight_limit(queued, monkeypatch):
+    monkeypatch.setattr(views.settings, 'MAX_INFLIGHT', 5)
+    pipeline = FakePipeline({'cpu': 2, 'gpu': 1, views._UNACKED_KEY: 1})
+    monkeypatch.setattr(views, '_BROKER', SimpleNamespace(pipeline=lambda transaction: pipeline))
+
+    response = post({'row_id': 'i-1'})
+
+    assert response.status_code == 202
+
+
+def test_queues_when_redis_is_down(queued, monkeypatch):
+    monkeypatch.setattr(views.settings, 'MAX_INFLIGHT', 5)
+
+    def unavailable():
+        raise redis.ConnectionError('down')
+
+    monkeypatch.setattr(views, '_queue_depth', unavailable)
+
+    response = post({'row_id': 'i-1'})
+
+    assert response.status_code == 202
+    assert queued == [('i-1', None, None)]
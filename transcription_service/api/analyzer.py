@@ -6,14 +6,68 @@ Generates summaries and extracts key insights from transcripts.
 """
 
 import logging
+import re
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# Theme keywords in priority order: a sentence is filed under the first
+# theme (lowest rank) whose keywords it mentions.
+THEME_KEYWORDS = (
+    ("Education vs Experience", ('education', 'school', 'college', 'program')),
+    ("Industry Compensation", ('flat rate', 'compensation', 'pay', 'salary', 'wage')),
+    ("Hands-on Training", ('hands on', 'hands-on', 'practice', 'lab', 'vehicle')),
+    ("Assessment and Certification", ('assessment', 'test', 'certification', 'grade', 'gpa')),
+    ("Employer Expectations", ('employer', 'dealership', 'shop', 'hire', 'hiring')),
+    ("Resources and Equipment", ('equipment', 'tools', 'resources', 'budget')),
+    ("Job Placement", ('graduate', 'job', 'placement', 'career')),
+)
+
+# Education sentences that also mention dropouts are filed as dropout discussion
+DROPOUT_KEYWORDS = ('dropout', 'drop out')
+
+# Insight reported for each theme that comes up, in report order
+THEME_INSIGHTS = (
+    ("Education vs Experience", "Discussion includes formal education and its role in professional development"),
+    ("Student Dropout Rates", "Student retention and dropout rates are significant concerns"),
+    ("Industry Compensation", "Compensation models and payment structures are discussed"),
+    ("Hands-on Training", "Practical, hands-on training is emphasized as important"),
+    ("Assessment and Certification", "Assessment methods and certification standards are addressed"),
+    ("Employer Expectations", "Gap between education outcomes and employer needs is highlighted"),
+    ("Resources and Equipment", "Resource availability and equipment access are key challenges"),
+    ("Job Placement", "Career placement and job opportunities are discussed"),
+)
+
+# Runs of text between periods, i.e. the sentences fed to categorization
+_SENTENCE_RE = re.compile(r'[^.]+')
+
+# Numbers and percentages quoted in the transcript, e.g. "30%", "4.5", "20 percent"
+_STAT_RE = re.compile(r'\b\d+(?:\.\d+)?(?:\s?%|\s?percent\b)?', re.IGNORECASE)
+
+
+def _iter_sentences(text):
+    """Yield the non-empty, stripped sentences of a transcript."""
+    for match in _SENTENCE_RE.finditer(text):
+        sentence = match.group(0).strip()
+        if sentence:
+            yield sentence
+
 
 class TranscriptAnalyzer:
     """Analyzes transcripts to extract themes, insights, and summaries."""
 
+    # One alternation with a named group per theme (t0, t1, ... in priority
+    # order). It sits inside a lookahead so overlapping keywords are all seen.
+    _THEME_RE = re.compile(
+        '(?=' + '|'.join(
+            f"(?P<t{rank}>{'|'.join(map(re.escape, keywords))})"
+            for rank, (_, keywords) in enumerate(THEME_KEYWORDS)
+        ) + ')',
+        re.IGNORECASE,
+    )
+    _GROUP_RANKS = {f"t{rank}": rank for rank in range(len(THEME_KEYWORDS))}
+    _DROPOUT_RE = re.compile('|'.join(map(re.escape, DROPOUT_KEYWORDS)), re.IGNORECASE)
+
     def __init__(self):
         """Initialize the analyzer with predefined themes."""
         self.themes = {
@@ -28,74 +82,87 @@ class TranscriptAnalyzer:
             "Industry Challenges": []
         }
 
-    def analyze(self, transcript_text):
+    def categorize(self, transcript_text):
         """
-        Analyze a transcript and generate a comprehensive summary.
+        Sort a transcript's sentences into themes without building a summary.
+        The result is also kept in self.themes for summary().
 
         Args:
             transcript_text: Full transcript as string
 
         Returns:
-            Dictionary with analysis results
+            Dictionary of theme -> list of sentences (pass it to
+            get_short_summary(themes=...)), or None if analysis failed
         """
         try:
             logger.info("Analyzing transcript...")
 
-            # Reset themes for new analysis
-            for key in self.themes:
-                self.themes[key] = []
-
-            # Split into sentences for analysis
-            sentences = [s.strip() for s in transcript_text.split('.') if s.strip()]
+            # Start from fresh theme lists so a dict returned earlier is never changed
+            self.themes = {key: [] for key in self.themes}
 
-            # Categorize sentences by theme
-            self._categorize_sentences(sentences)
-
-            # Generate summary structure
-            summary = self._generate_summary(transcript_text)
+            # Categorize sentences by theme, streaming them instead of building a list
+            self._categorize_sentences(_iter_sentences(transcript_text))
 
             logger.info("Analysis completed successfully")
-            return summary
+            return self.themes
 
         except Exception as e:
             logger.error(f"Error during analysis: {e}")
             return None
 
-    def _categorize_sentences(self, sentences):
-        """Categorize sentences into themes based on keywords."""
-        for sentence in sentences:
-            sentence_lower = sentence.lower()
+    def summary(self, transcript_text):
+        """
+        Build the summary dictionary for the last categorized transcript.
+
+        Args:
+            transcript_text: Full transcript passed to categorize()
+
+        Returns:
+            Dictionary with analysis results
+        """
+        return self._generate_summary(transcript_text)
+
+    def analyze(self, transcript_text):
+        """
+        Analyze a transcript and generate a comprehensive summary.
+
+        Args:
+            transcript_text: Full transcript as string
 
-            # Education and programs
-            if any(keyword in sentence_lower for keyword in ['education', 'school', 'college', 'program']):
-                if 'dropout' in sentence_lower or 'drop out' in sentence_lower:
-                    self.themes["Student Dropout Rates"].append(sentence)
-                else:
-                    self.themes["Education vs Experience"].append(sentence)
+        Returns:
+            Dictionary with analysis results
+        """
+        if self.categorize(transcript_text) is None:
+            return None
 
-            # Compensation and pay
-            elif any(keyword in sentence_lower for keyword in ['flat rate', 'compensation', 'pay', 'salary', 'wage']):
-                self.themes["Industry Compensation"].append(sentence)
+        try:
+            return self.summary(transcript_text)
 
-            # Hands-on training
-            elif any(keyword in sentence_lower for keyword in ['hands on', 'hands-on', 'practice', 'lab', 'vehicle']):
-                self.themes["Hands-on Training"].append(sentence)
+        except Exception as e:
+            logger.error(f"Error during analysis: {e}")
+            return None
 
-            # Assessment
-            elif any(keyword in sentence_lower for keyword in ['assessment', 'test', 'certification', 'grade', 'gpa']):
-                self.themes["Assessment and Certification"].append(sentence)
+    def _categorize_sentences(self, sentences):
+        """Categorize sentences into themes based on keywords."""
+        for sentence in sentences:
+            rank = None
+            for match in self._THEME_RE.finditer(sentence):
+                match_rank = self._GROUP_RANKS[match.lastgroup]
+                if rank is None or match_rank < rank:
+                    rank = match_rank
+                    if rank == 0:
+                        break  # Nothing outranks the first theme
 
-            # Employers
-            elif any(keyword in sentence_lower for keyword in ['employer', 'dealership', 'shop', 'hire', 'hiring']):
-                self.themes["Employer Expectations"].append(sentence)
+            if rank is not None:
+                self._file_sentence(sentence, rank)
 
-            # Resources
-            elif any(keyword in sentence_lower for keyword in ['equipment', 'tools', 'resources', 'budget']):
-                self.themes["Resources and Equipment"].append(sentence)
+    def _file_sentence(self, sentence, rank):
+        """Add a sentence to the theme with the given rank."""
+        theme = THEME_KEYWORDS[rank][0]
+        if rank == 0 and self._DROPOUT_RE.search(sentence):
+            theme = "Student Dropout Rates"
 
-            # Job placement
-            elif any(keyword in sentence_lower for keyword in ['graduate', 'job', 'placement', 'career']):
-                self.themes["Job Placement"].append(sentence)
+        self.themes[theme].append(sentence)
 
     def _generate_summary(self, full_text):
         """Generate structured summary from analysis."""
@@ -104,7 +171,7 @@ class TranscriptAnalyzer:
             "transcript_length": len(full_text),
             "main_topics": {},
             "key_insights": [],
-            "statistics_mentioned": [],
+            "statistics_mentioned": self._extract_statistics(full_text),
         }
 
         # Process themes with content
@@ -117,42 +184,20 @@ class TranscriptAnalyzer:
 
         # Generate key insights (these are generic - could be enhanced with NLP)
         if summary["main_topics"]:
-            summary["key_insights"] = self._extract_insights()
+            summary["key_insights"] = self._extract_insights(self.themes)
 
         return summary
 
-    def _extract_insights(self):
+    def _extract_statistics(self, text):
+        """Collect distinct numbers and percentages mentioned, in order of appearance."""
+        return list(dict.fromkeys(_STAT_RE.findall(text)))
+
+    def _extract_insights(self, themes):
         """
         Extract key insights based on identified themes.
         This is a simplified version - could be enhanced with NLP.
         """
-        insights = []
-
-        if self.themes["Education vs Experience"]:
-            insights.append("Discussion includes formal education and its role in professional development")
-
-        if self.themes["Student Dropout Rates"]:
-            insights.append("Student retention and dropout rates are significant concerns")
-
-        if self.themes["Industry Compensation"]:
-            insights.append("Compensation models and payment structures are discussed")
-
-        if self.themes["Hands-on Training"]:
-            insights.append("Practical, hands-on training is emphasized as important")
-
-        if self.themes["Assessment and Certification"]:
-            insights.append("Assessment methods and certification standards are addressed")
-
-        if self.themes["Employer Expectations"]:
-            insights.append("Gap between education outcomes and employer needs is highlighted")
-
-        if self.themes["Resources and Equipment"]:
-            insights.append("Resource availability and equipment access are key challenges")
-
-        if self.themes["Job Placement"]:
-            insights.append("Career placement and job opportunities are discussed")
-
-        return insights
+        return [insight for theme, insight in THEME_INSIGHTS if themes[theme]]
 
     def format_summary_markdown(self, summary):
         """
@@ -167,56 +212,66 @@ class TranscriptAnalyzer:
         if not summary:
             return "Analysis failed"
 
-        md_output = "# Transcript Analysis Summary\n\n"
-        md_output += f"**Analysis Date:** {summary['analysis_date']}\n"
-        md_output += f"**Transcript Length:** {summary['transcript_length']} characters\n\n"
+        parts = [
+            "# Transcript Analysis Summary\n\n",
+            f"**Analysis Date:** {summary['analysis_date']}\n",
+            f"**Transcript Length:** {summary['transcript_length']} characters\n\n",
+        ]
 
         # Main topics
         if summary['main_topics']:
-            md_output += "## Main Topics Discussed\n\n"
+            parts.append("## Main Topics Discussed\n\n")
             for topic, details in summary['main_topics'].items():
-                md_output += f"### {topic}\n"
-                md_output += f"**Discussion Points:** {details['discussion_length']} relevant segments\n\n"
-                md_output += "**Key Quotes:**\n"
+                parts.append(f"### {topic}\n")
+                parts.append(f"**Discussion Points:** {details['discussion_length']} relevant segments\n\n")
+                parts.append("**Key Quotes:**\n")
                 for point in details['key_points']:
-                    md_output += f"- {point}\n"
-                md_output += "\n"
+                    parts.append(f"- {point}\n")
+                parts.append("\n")
 
         # Key insights
         if summary['key_insights']:
-            md_output += "## Key Insights\n\n"
+            parts.append("## Key Insights\n\n")
             for i, insight in enumerate(summary['key_insights'], 1):
-                md_output += f"{i}. {insight}\n"
-            md_output += "\n"
+                parts.append(f"{i}. {insight}\n")
+            parts.append("\n")
 
-        return md_output
+        return ''.join(parts)
 
-    def get_short_summary(self, summary):
+    def get_short_summary(self, summary=None, themes=None):
         """
         Generate a short summary suitable for Coda table display.
 
         Args:
             summary: Summary dictionary from analyze()
+            themes: Themes dictionary from categorize(), used instead of
+                    summary so the full summary doesn't have to be built
 
         Returns:
             Concise summary string
         """
-        if not summary or not summary.get('main_topics'):
+        if themes is not None:
+            topics = [theme for theme, content in themes.items() if content]
+            insights = self._extract_insights(themes) if topics else []
+        elif summary:
+            topics = list(summary.get('main_topics', {}).keys())
+            insights = summary.get('key_insights', [])
+        else:
+            topics = []
+
+        if not topics:
             return "No significant topics identified"
 
-        topics = list(summary['main_topics'].keys())
-        insights = summary.get('key_insights', [])
-
-        short = f"Topics: {', '.join(topics[:3])}"
+        parts = [f"Topics: {', '.join(topics[:3])}"]
         if len(topics) > 3:
-            short += f" (+{len(topics)-3} more)"
+            parts.append(f" (+{len(topics)-3} more)")
 
         if insights:
-            short += f"\n\nKey Insights:\n"
+            parts.append("\n\nKey Insights:\n")
             for i, insight in enumerate(insights[:3], 1):
-                short += f"{i}. {insight}\n"
+                parts.append(f"{i}. {insight}\n")
 
-        return short
+        return ''.join(parts)
 
 
 if __name__ == "__main__":
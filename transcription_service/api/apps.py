@@ -1,6 +1,22 @@
+import logging
+from celery import current_app
 from django.apps import AppConfig
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        """Open a pooled broker connection up front if WARM_BROKER_POOL is set."""
+        if not settings.WARM_BROKER_POOL:
+            return
+
+        try:
+            with current_app.producer_pool.acquire(block=True) as producer:
+                producer.connection.ensure_connection(max_retries=1)
+        except Exception as e:
+            logger.error(f"Error warming broker connection pool: {e}")
@@ -7,7 +7,7 @@ Handles reading pending rows and updating them with transcription results.
 import os
 import logging
 from datetime import datetime
-from codaio import Coda, Document, Cell
+from codaio import Coda, Document, Cell, err
 from dotenv import load_dotenv
 
 logger = logging.getLogger(__name__)
@@ -16,6 +16,11 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 
 
+def _timestamp():
+    """Current time formatted for the processed date column."""
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
 class CodaTranscriptionClient:
     """Client for managing transcription workflow in Coda."""
 
@@ -40,8 +45,20 @@ class CodaTranscriptionClient:
         self.doc = Document(self.doc_id, coda=self.coda)
         self.table = self.doc.get_table(self.table_id)
 
+        # Column name -> column ID map, built once instead of per cell lookup
+        self.refresh_columns()
+
         logger.info("Coda client initialized successfully")
 
+    def refresh_columns(self):
+        """
+        Reload the column name -> ID map from Coda.
+        Call this after columns are added or renamed in the table.
+        """
+        # codaio memoizes columns on the table object; clear it to force a fetch
+        self.table.columns_storage = []
+        self._col_map = {col.name: col.id for col in self.table.columns()}
+
     def get_pending_rows(self):
         """
         Fetch all rows with status "Pending".
@@ -50,15 +67,13 @@ class CodaTranscriptionClient:
             List of row objects that need processing
         """
         try:
-            all_rows = self.table.rows()
-            pending_rows = []
-
-            for row in all_rows:
-                # Get the status value from the row
-                status_value = self._get_cell_value(row, self.col_status)
+            status_column_id = self._col_map.get(self.col_status)
+            if not status_column_id:
+                logger.error(f"Column '{self.col_status}' not found")
+                return []
 
-                if status_value and status_value.lower() == "pending":
-                    pending_rows.append(row)
+            # Let Coda filter on the status column instead of paging the whole table
+            pending_rows = self.table.find_row_by_column_id_and_value(status_column_id, "Pending")
 
             logger.info(f"Found {len(pending_rows)} pending row(s)")
             return pending_rows
@@ -67,6 +82,27 @@ class CodaTranscriptionClient:
             logger.error(f"Error fetching pending rows: {e}")
             return []
 
+    def get_row(self, row_id):
+        """
+        Fetch a single row by ID.
+
+        Args:
+            row_id: Coda row ID
+
+        Returns:
+            Row object or None if not found
+
+        Raises:
+            codaio.err.CodaError (or a requests exception) for other API
+            failures, so callers can retry them
+        """
+        try:
+            return self.table.get_row_by_id(row_id)
+
+        except err.NotFound as e:
+            logger.error(f"Row {row_id} not found: {e}")
+            return None
+
     def get_audio_url_from_row(self, row):
         """
         Extract audio URL from a row.
@@ -79,12 +115,12 @@ class CodaTranscriptionClient:
         """
         return self._get_cell_value(row, self.col_audio_url)
 
-    def update_row_with_results(self, row, transcript, summary):
+    def update_row_with_results(self, row_id, transcript, summary):
         """
         Update a row with transcription and summary results.
 
         Args:
-            row: Coda row object to update
+            row_id: ID of the Coda row to update
             transcript: Full transcript text
             summary: Summary text
 
@@ -92,7 +128,7 @@ class CodaTranscriptionClient:
             True if successful, False otherwise
         """
         try:
-            current_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            current_date = _timestamp()
 
             cells = [
                 Cell(column=self.col_transcript, value_storage=transcript),
@@ -100,22 +136,22 @@ class CodaTranscriptionClient:
                 Cell(column=self.col_processed_date, value_storage=current_date),
             ]
 
-            # Update the row
-            self.table.update_row(row, cells=cells)
+            # Update the row by ID; no need to fetch it first
+            self.table.update_row(row_id, cells=cells)
 
-            logger.info(f"Updated row {row.id} with transcription results")
+            logger.info(f"Updated row {row_id} with transcription results")
             return True
 
         except Exception as e:
-            logger.error(f"Error updating row {row.id}: {e}")
+            logger.error(f"Error updating row {row_id}: {e}")
             return False
 
-    def mark_row_as_failed(self, row, error_message):
+    def mark_row_as_failed(self, row_id, error_message):
         """
         Mark a row as failed with error message.
 
         Args:
-            row: Coda row object
+            row_id: ID of the Coda row
             error_message: Error description
 
         Returns:
@@ -125,11 +161,11 @@ class CodaTranscriptionClient:
             cells = [
                 Cell(column=self.col_status, value_storage="Failed"),
                 Cell(column=self.col_summary, value_storage=f"ERROR: {error_message}"),
-                Cell(column=self.col_processed_date, value_storage=datetime.now().strftime('%Y-%m-%d %H:%M:%S')),
+                Cell(column=self.col_processed_date, value_storage=_timestamp()),
             ]
 
-            self.table.update_row(row, cells=cells)
-            logger.warning(f"Marked row {row.id} as failed: {error_message}")
+            self.table.update_row(row_id, cells=cells)
+            logger.warning(f"Marked row {row_id} as failed: {error_message}")
             return True
 
         except Exception as e:
@@ -148,14 +184,7 @@ class CodaTranscriptionClient:
             Cell value or None
         """
         try:
-            # Get column ID by name
-            columns = self.table.columns()
-            column_id = None
-
-            for col in columns:
-                if col.name == column_name:
-                    column_id = col.id
-                    break
+            column_id = self._col_map.get(column_name)
 
             if not column_id:
                 logger.error(f"Column '{column_name}' not found")
@@ -6,12 +6,43 @@ Handles downloading audio files from Google Drive URLs.
 
 import os
 import re
+import shutil
+import subprocess
+import threading
 import requests
 import logging
 from urllib.parse import urlparse, parse_qs
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 logger = logging.getLogger(__name__)
 
+# Copy buffer for streaming downloads to disk
+DOWNLOAD_BUFFER_SIZE = 1024 * 1024
+
+# Upper bound in seconds on streaming and decoding one file through ffmpeg
+STREAM_DECODE_TIMEOUT = int(os.getenv('STREAM_DECODE_TIMEOUT', '1800'))
+
+# Matches the file ID in /file/d/ID, /d/ID and ?id=ID style URLs
+_FILE_ID_RE = re.compile(r'(?:/file/d/|id=|/d/)([a-zA-Z0-9_-]+)')
+
+# Containers ffmpeg can't reliably decode from a pipe, because their index may
+# sit at the end of the file (e.g. M4A voice memos). Recognized by the
+# Content-Type or the filename Google Drive sends with the download.
+_SEEKABLE_CONTENT_TYPES = ('audio/mp4', 'audio/m4a', 'audio/x-m4a', 'video/mp4', 'video/quicktime', 'audio/3gpp', 'video/3gpp')
+_SEEKABLE_EXTENSIONS = ('.m4a', '.m4b', '.mp4', '.mov', '.3gp')
+
+# Filename in a Content-Disposition header, plain or RFC 5987 encoded (filename*=UTF-8''name)
+_FILENAME_RE = re.compile(r"filename\*?=(?:[\w-]+'[\w-]*')?\"?([^\";]+)", re.IGNORECASE)
+
+# Shared session so worker processes reuse pooled TLS connections across downloads
+_SESSION = requests.Session()
+_SESSION.mount('https://', HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=16,
+    max_retries=Retry(total=3, backoff_factor=0.3),
+))
+
 
 def extract_file_id(google_drive_url):
     """
@@ -28,21 +59,93 @@ def extract_file_id(google_drive_url):
     Returns:
         File ID string or None if not found
     """
-    patterns = [
-        r'/file/d/([a-zA-Z0-9_-]+)',
-        r'id=([a-zA-Z0-9_-]+)',
-        r'/d/([a-zA-Z0-9_-]+)',
-    ]
-
-    for pattern in patterns:
-        match = re.search(pattern, google_drive_url)
-        if match:
-            return match.group(1)
+    match = _FILE_ID_RE.search(google_drive_url)
+    if match:
+        return match.group(1)
 
     logger.error(f"Could not extract file ID from URL: {google_drive_url}")
     return None
 
 
+def _open_download(file_url):
+    """
+    Start a streamed download of a Google Drive file.
+
+    Args:
+        file_url: Google Drive URL (any supported format)
+
+    Returns:
+        Streaming response with status 200, or None if the download failed
+    """
+    file_id = extract_file_id(file_url)
+    if not file_id:
+        return None
+
+    logger.info(f"Downloading file ID: {file_id}")
+
+    # Use Google Drive download URL
+    download_url = f"https://drive.google.com/uc?export=download&id={file_id}"
+
+    # First request to get the file
+    response = _SESSION.get(download_url, stream=True)
+
+    # Check if we need to confirm download (large files)
+    if 'download_warning' in response.cookies:
+        params = {'id': file_id, 'confirm': response.cookies['download_warning']}
+        response = _SESSION.get(download_url, params=params, stream=True)
+
+    # Check for virus scan warning (very large files)
+    if 'text/html' in response.headers.get('Content-Type', ''):
+        # Try to extract the confirm token from HTML
+        token_match = re.search(r'confirm=([^&]+)', response.text)
+        if token_match:
+            confirm_token = token_match.group(1)
+            params = {'id': file_id, 'confirm': confirm_token}
+            response = _SESSION.get(download_url, params=params, stream=True)
+
+    if response.status_code != 200:
+        logger.error(f"Download failed with status code: {response.status_code}")
+        response.close()
+        return None
+
+    return response
+
+
+def _needs_seekable_input(response):
+    """Whether a download is a container that ffmpeg can't decode from a pipe."""
+    content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+    if content_type in _SEEKABLE_CONTENT_TYPES:
+        return True
+
+    match = _FILENAME_RE.search(response.headers.get('Content-Disposition', ''))
+    return bool(match) and match.group(1).strip().lower().endswith(_SEEKABLE_EXTENSIONS)
+
+
+def can_stream_audio(file_url):
+    """
+    Check whether a Google Drive file can be decoded by fetch_audio_as_array().
+    Only the response headers are read; the body is not downloaded.
+
+    Args:
+        file_url: Google Drive URL (any supported format)
+
+    Returns:
+        True if the file can be streamed, False if it needs a download
+        (or could not be opened)
+    """
+    try:
+        response = _open_download(file_url)
+        if response is None:
+            return False
+
+        with response:
+            return not _needs_seekable_input(response)
+
+    except Exception as e:
+        logger.error(f"Error checking audio file: {e}")
+        return False
+
+
 def download_file_from_google_drive(file_url, destination_path):
     """
     Download a file from Google Drive.
@@ -55,56 +158,120 @@ def download_file_from_google_drive(file_url, destination_path):
         True if download successful, False otherwise
     """
     try:
-        file_id = extract_file_id(file_url)
-        if not file_id:
+        response = _open_download(file_url)
+        if response is None:
             return False
 
-        logger.info(f"Downloading file ID: {file_id}")
-
-        # Use Google Drive download URL
-        download_url = f"https://drive.google.com/uc?export=download&id={file_id}"
-
-        # Create session for cookies
-        session = requests.Session()
-
-        # First request to get the file
-        response = session.get(download_url, stream=True)
-
-        # Check if we need to confirm download (large files)
-        if 'download_warning' in response.cookies:
-            params = {'id': file_id, 'confirm': response.cookies['download_warning']}
-            response = session.get(download_url, params=params, stream=True)
-
-        # Check for virus scan warning (very large files)
-        if 'text/html' in response.headers.get('Content-Type', ''):
-            # Try to extract the confirm token from HTML
-            token_match = re.search(r'confirm=([^&]+)', response.text)
-            if token_match:
-                confirm_token = token_match.group(1)
-                params = {'id': file_id, 'confirm': confirm_token}
-                response = session.get(download_url, params=params, stream=True)
-
-        # Save the file
-        if response.status_code == 200:
-            os.makedirs(os.path.dirname(destination_path), exist_ok=True)
-
-            with open(destination_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=32768):
-                    if chunk:
-                        f.write(chunk)
-
-            file_size = os.path.getsize(destination_path)
-            logger.info(f"Downloaded file successfully: {destination_path} ({file_size} bytes)")
-            return True
-        else:
-            logger.error(f"Download failed with status code: {response.status_code}")
-            return False
+        os.makedirs(os.path.dirname(destination_path), exist_ok=True)
+
+        # Stream the raw body straight to disk in large blocks
+        response.raw.decode_content = True
+        with response, open(destination_path, 'wb') as f:
+            shutil.copyfileobj(response.raw, f, length=DOWNLOAD_BUFFER_SIZE)
+
+        file_size = os.path.getsize(destination_path)
+        logger.info(f"Downloaded file successfully: {destination_path} ({file_size} bytes)")
+        return True
 
     except Exception as e:
         logger.error(f"Error downloading file: {e}")
         return False
 
 
+def fetch_audio_as_array(file_url, sampling_rate=16000):
+    """
+    Stream a file from Google Drive through ffmpeg into mono PCM samples.
+    Nothing is written to disk: the HTTP body is piped into ffmpeg's stdin
+    and the decoded audio is read back from its stdout.
+
+    Formats that need a seekable input (e.g. MP4/M4A files with the index
+    at the end) cannot be decoded this way. They are refused from the
+    response headers before anything is piped (see can_stream_audio());
+    callers should fall back to download_file_from_google_drive() when
+    this returns None.
+
+    Args:
+        file_url: Google Drive URL (any supported format)
+        sampling_rate: Output sample rate in Hz (Whisper expects 16000)
+
+    Returns:
+        float32 numpy array of samples in [-1, 1], or None if it failed
+    """
+    # Imported here so the web and cpu processes, which never decode audio, don't need numpy
+    import numpy as np
+
+    try:
+        response = _open_download(file_url)
+        if response is None:
+            return None
+
+        if _needs_seekable_input(response):
+            response.close()
+            logger.info("Audio container needs seeking, not streaming it")
+            return None
+
+        process = subprocess.Popen(
+            ['ffmpeg', '-nostdin', '-loglevel', 'error', '-i', 'pipe:0',
+             '-f', 's16le', '-ac', '1', '-ar', str(sampling_rate), 'pipe:1'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+
+        # Feed stdin and drain stdout and stderr from separate threads, so a full
+        # pipe can't block ffmpeg (or the download) while another one is in use
+        def feed_ffmpeg():
+            try:
+                with response:
+                    for chunk in response.iter_content(DOWNLOAD_BUFFER_SIZE):
+                        process.stdin.write(chunk)
+            except (BrokenPipeError, OSError):
+                pass  # ffmpeg exited early; its return code reports the problem
+            finally:
+                try:
+                    process.stdin.close()
+                except OSError:
+                    pass
+
+        output = {}
+
+        def drain(name, pipe):
+            output[name] = pipe.read()
+
+        threads = [
+            threading.Thread(target=feed_ffmpeg, daemon=True),
+            threading.Thread(target=drain, args=('pcm', process.stdout), daemon=True),
+            threading.Thread(target=drain, args=('stderr', process.stderr), daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            process.wait(timeout=STREAM_DECODE_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+            response.close()
+            logger.error(f"ffmpeg did not finish decoding streamed audio within {STREAM_DECODE_TIMEOUT}s")
+            return None
+
+        for thread in threads:
+            thread.join()
+        pcm, stderr = output['pcm'], output['stderr']
+
+        if process.returncode != 0 or not pcm:
+            logger.error(f"ffmpeg could not decode streamed audio: {stderr.decode(errors='replace').strip()}")
+            return None
+
+        audio = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+        logger.info(f"Decoded streamed audio: {len(audio) / sampling_rate:.1f}s at {sampling_rate} Hz")
+        return audio
+
+    except Exception as e:
+        logger.error(f"Error streaming audio: {e}")
+        return None
+
+
 def get_filename_from_url(file_url):
     """
     Try to get filename from Google Drive URL.
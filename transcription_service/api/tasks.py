@@ -1,143 +1,293 @@
 """
 Celery tasks for background transcription processing.
+
+A transcription runs as a chain of three tasks so only the Whisper step
+needs a GPU worker:
+
+    download_audio_task (cpu) -> transcribe_audio_task (gpu) -> update_row_task (cpu)
+
+Each task passes a dict to the next one. An error dict ({'status': 'error'})
+is passed through unchanged by the remaining tasks.
 """
 
 import os
 import logging
-from celery import shared_task
+from celery import chain, current_app, shared_task
+from celery.exceptions import Retry, SoftTimeLimitExceeded
 from django.conf import settings
 from .coda_client import CodaTranscriptionClient
-from .google_drive_downloader import download_file_from_google_drive, get_filename_from_url
-from .transcriber import AudioTranscriber
+from .google_drive_downloader import (
+    can_stream_audio,
+    download_file_from_google_drive,
+    fetch_audio_as_array,
+    get_filename_from_url,
+)
+from .transcriber import get_transcriber
 from .analyzer import TranscriptAnalyzer
 
 logger = logging.getLogger(__name__)
 
+# Coda client shared by every task run in this worker process
+_CODA_CLIENT = None
+
+
+def _get_coda_client():
+    """Return this process's Coda client, creating it on first use."""
+    global _CODA_CLIENT
+    if _CODA_CLIENT is None:
+        _CODA_CLIENT = CodaTranscriptionClient()
+    return _CODA_CLIENT
+
+
+def queue_transcription(row_id, audio_url=None, language=None):
+    """
+    Queue the transcription chain for a Coda row.
+
+    Args:
+        row_id: Coda row ID to process
+        audio_url: Optional Google Drive URL (if not provided, fetched from row)
+        language: Optional spoken language code; skips language detection
+
+    Returns:
+        AsyncResult of the last task in the chain
+    """
+    # Publish over a pooled broker connection instead of setting one up per call
+    with current_app.producer_pool.acquire(block=True) as producer:
+        return chain(
+            download_audio_task.s(row_id, audio_url, language),
+            transcribe_audio_task.s(),
+            update_row_task.s(),
+        ).apply_async(producer=producer)
+
+
+def _fail(coda_client, row_id, error_msg):
+    """Log an error, mark the row as failed in Coda and build the error result."""
+    logger.error(error_msg)
+    if row_id:
+        coda_client.mark_row_as_failed(row_id, error_msg)
+    return {
+        'status': 'error',
+        'error': error_msg
+    }
+
+
+def _remove_temp_file(temp_file_path):
+    """Delete a downloaded audio file if it exists."""
+    if temp_file_path and os.path.exists(temp_file_path):
+        try:
+            os.remove(temp_file_path)
+            logger.info(f"Cleaned up temp file: {temp_file_path}")
+        except Exception as cleanup_error:
+            logger.error(f"Error cleaning up temp file: {cleanup_error}")
+
+
+def _retry_or_fail(task, exc):
+    """Retry the task, or build the error result once retries are exhausted."""
+    try:
+        raise task.retry(exc=exc, countdown=60)  # Retry after 60 seconds
+    except Retry:
+        raise
+    except Exception:
+        # Max retries exceeded
+        return {
+            'status': 'error',
+            'error': str(exc),
+            'retries_exceeded': True
+        }
+
 
 @shared_task(bind=True, max_retries=3)
-def process_transcription_task(self, row_id, audio_url=None):
+def download_audio_task(self, row_id, audio_url=None, language=None):
     """
-    Background task to process audio transcription.
+    Download a row's audio file from Google Drive.
 
     Args:
         row_id: Coda row ID to process
         audio_url: Optional Google Drive URL (if not provided, fetched from row)
+        language: Optional spoken language code, passed on to transcription
 
     Returns:
-        dict with processing results
+        dict with 'row_id', 'language' and the local 'audio_path' (or the
+        'audio_url' when STREAM_AUDIO is enabled and the file can be
+        streamed), or an error dict
     """
     temp_file_path = None
 
     try:
-        logger.info(f"Starting transcription task for row: {row_id}")
+        logger.info(f"Starting transcription for row: {row_id}")
 
-        # Initialize components
-        coda_client = CodaTranscriptionClient()
-        transcriber = AudioTranscriber(model_name=settings.WHISPER_MODEL)
-        analyzer = TranscriptAnalyzer()
+        coda_client = _get_coda_client()
 
         # Create temp directory
         os.makedirs(settings.TEMP_DOWNLOAD_DIR, exist_ok=True)
 
         # Get the row from Coda
         logger.info("Fetching row from Coda...")
-        all_rows = coda_client.table.rows()
-        target_row = None
-
-        for row in all_rows:
-            if row.id == row_id:
-                target_row = row
-                break
+        target_row = coda_client.get_row(row_id)
 
         if not target_row:
-            error_msg = f"Row {row_id} not found in Coda table"
-            logger.error(error_msg)
-            return {
-                'status': 'error',
-                'error': error_msg
-            }
+            return _fail(coda_client, None, f"Row {row_id} not found in Coda table")
 
         # Get audio URL if not provided
         if not audio_url:
             audio_url = coda_client.get_audio_url_from_row(target_row)
 
         if not audio_url:
-            error_msg = "No audio URL found"
-            logger.error(error_msg)
-            coda_client.mark_row_as_failed(target_row, error_msg)
-            return {
-                'status': 'error',
-                'error': error_msg
-            }
+            return _fail(coda_client, row_id, "No audio URL found")
 
         logger.info(f"Audio URL: {audio_url}")
 
+        # The transcription worker streams and decodes the audio itself, except for
+        # containers that need seeking (e.g. M4A), which are downloaded here instead
+        if settings.STREAM_AUDIO and can_stream_audio(audio_url):
+            return {
+                'row_id': row_id,
+                'language': language,
+                'audio_url': audio_url
+            }
+
         # Download audio file
         logger.info("Downloading audio from Google Drive...")
-        filename = get_filename_from_url(audio_url)
+        # Prefix with the task ID so overlapping chains for the same file don't share (and delete) it
+        filename = f"{self.request.id}_{get_filename_from_url(audio_url)}"
         temp_file_path = os.path.join(settings.TEMP_DOWNLOAD_DIR, filename)
 
         if not download_file_from_google_drive(audio_url, temp_file_path):
-            error_msg = "Failed to download audio file"
-            logger.error(error_msg)
-            coda_client.mark_row_as_failed(target_row, error_msg)
-            return {
-                'status': 'error',
-                'error': error_msg
-            }
+            return _fail(coda_client, row_id, "Failed to download audio file")
 
         logger.info(f"Downloaded to: {temp_file_path}")
 
+        return {
+            'row_id': row_id,
+            'language': language,
+            'audio_path': temp_file_path
+        }
+
+    except Exception as e:
+        logger.error(f"Error in download task: {e}", exc_info=True)
+        _remove_temp_file(temp_file_path)
+        return _retry_or_fail(self, e)
+
+
+@shared_task(
+    bind=True,
+    max_retries=3,
+    soft_time_limit=settings.TRANSCRIBE_TIME_LIMIT,
+    time_limit=settings.TRANSCRIBE_TIME_LIMIT + 60,
+)
+def transcribe_audio_task(self, payload):
+    """
+    Transcribe a downloaded (or streamed) audio file with Whisper.
+
+    Args:
+        payload: Result of download_audio_task
+
+    Returns:
+        payload extended with 'text' and 'language', or an error dict
+    """
+    if payload.get('status') == 'error':
+        return payload
+
+    row_id = payload['row_id']
+    temp_file_path = payload.get('audio_path')
+
+    try:
+        coda_client = _get_coda_client()
+        transcriber = get_transcriber()
+
         # Load Whisper model and transcribe
         logger.info("Loading Whisper model...")
         if not transcriber.load_model():
-            error_msg = "Failed to load Whisper model"
-            logger.error(error_msg)
-            coda_client.mark_row_as_failed(target_row, error_msg)
-            if temp_file_path and os.path.exists(temp_file_path):
-                os.remove(temp_file_path)
-            return {
-                'status': 'error',
-                'error': error_msg
-            }
+            _remove_temp_file(temp_file_path)
+            return _fail(coda_client, row_id, "Failed to load Whisper model")
+
+        audio = temp_file_path
+        if audio is None:
+            audio_url = payload['audio_url']
+            logger.info("Streaming audio from Google Drive...")
+            audio = fetch_audio_as_array(audio_url)
+
+            if audio is None:
+                # Some files (e.g. M4A with the index at the end) can't be decoded from a pipe
+                logger.info("Streaming failed, downloading audio instead...")
+                filename = f"{self.request.id}_{get_filename_from_url(audio_url)}"
+                temp_file_path = os.path.join(settings.TEMP_DOWNLOAD_DIR, filename)
+                if not download_file_from_google_drive(audio_url, temp_file_path):
+                    return _fail(coda_client, row_id, "Failed to download audio file")
+                audio = temp_file_path
 
         logger.info("Transcribing audio...")
-        transcription_result = transcriber.transcribe(temp_file_path)
+        transcription_result = transcriber.transcribe(audio, language=payload.get('language'))
 
         if not transcription_result:
-            error_msg = "Transcription failed"
-            logger.error(error_msg)
-            coda_client.mark_row_as_failed(target_row, error_msg)
-            if temp_file_path and os.path.exists(temp_file_path):
-                os.remove(temp_file_path)
-            return {
-                'status': 'error',
-                'error': error_msg
-            }
+            _remove_temp_file(temp_file_path)
+            return _fail(coda_client, row_id, "Transcription failed")
 
         full_transcript = transcription_result['text']
         logger.info(f"Transcription successful ({len(full_transcript)} characters)")
 
+        # The audio is no longer needed once it has been transcribed
+        _remove_temp_file(temp_file_path)
+
+        return {
+            'row_id': row_id,
+            'text': full_transcript,
+            'language': transcription_result.get('language', 'unknown')
+        }
+
+    except SoftTimeLimitExceeded:
+        # Retrying would only hit the limit again
+        _remove_temp_file(temp_file_path)
+        return _fail(_get_coda_client(), row_id, f"Transcription exceeded {settings.TRANSCRIBE_TIME_LIMIT}s time limit")
+
+    except Exception as e:
+        logger.error(f"Error in transcription task: {e}", exc_info=True)
+
+        # Keep the download for the retry; only drop it once retries are exhausted
+        result = _retry_or_fail(self, e)
+        _remove_temp_file(temp_file_path)
+        return result
+
+
+@shared_task(bind=True, max_retries=3)
+def update_row_task(self, payload):
+    """
+    Analyze a transcript and write the results back to Coda.
+
+    Args:
+        payload: Result of transcribe_audio_task
+
+    Returns:
+        dict with processing results
+    """
+    if payload.get('status') == 'error':
+        return payload
+
+    row_id = payload['row_id']
+    full_transcript = payload['text']
+
+    try:
+        coda_client = _get_coda_client()
+        analyzer = TranscriptAnalyzer()
+
         # Analyze transcript
         logger.info("Analyzing transcript...")
-        analysis_result = analyzer.analyze(full_transcript)
-
-        if not analysis_result:
+        themes = analyzer.categorize(full_transcript)
+        if themes is None:
             error_msg = "Analysis failed"
             logger.warning(error_msg)
             summary_text = "Analysis failed, but transcription succeeded."
         else:
-            summary_text = analyzer.get_short_summary(analysis_result)
+            # Only the short summary is stored, so skip building the full summary dict
+            summary_text = analyzer.get_short_summary(themes=themes)
 
         logger.info("Analysis complete")
 
         # Update Coda row
         logger.info("Updating Coda row with results...")
-        if not coda_client.update_row_with_results(target_row, full_transcript, summary_text):
+        if not coda_client.update_row_with_results(row_id, full_transcript, summary_text):
             error_msg = "Failed to update Coda row"
             logger.error(error_msg)
-            if temp_file_path and os.path.exists(temp_file_path):
-                os.remove(temp_file_path)
             return {
                 'status': 'error',
                 'error': error_msg
@@ -145,35 +295,13 @@ def process_transcription_task(self, row_id, audio_url=None):
 
         logger.info("✓ Row updated successfully")
 
-        # Clean up temp file
-        if temp_file_path and os.path.exists(temp_file_path):
-            os.remove(temp_file_path)
-            logger.info(f"Cleaned up temp file: {temp_file_path}")
-
         return {
             'status': 'success',
             'row_id': row_id,
             'transcript_length': len(full_transcript),
-            'language': transcription_result.get('language', 'unknown')
+            'language': payload.get('language', 'unknown')
         }
 
     except Exception as e:
-        logger.error(f"Error in transcription task: {e}", exc_info=True)
-
-        # Clean up temp file on error
-        if temp_file_path and os.path.exists(temp_file_path):
-            try:
-                os.remove(temp_file_path)
-            except Exception as cleanup_error:
-                logger.error(f"Error cleaning up temp file: {cleanup_error}")
-
-        # Retry the task if it hasn't exceeded max retries
-        try:
-            raise self.retry(exc=e, countdown=60)  # Retry after 60 seconds
-        except Exception:
-            # Max retries exceeded
-            return {
-                'status': 'error',
-                'error': str(e),
-                'retries_exceeded': True
-            }
+        logger.error(f"Error in update task: {e}", exc_info=True)
+        return _retry_or_fail(self, e)
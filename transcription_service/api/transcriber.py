@@ -1,41 +1,92 @@
 #!/usr/bin/env python3
 """
-Audio transcription module using OpenAI Whisper.
+Audio transcription module using faster-whisper (CTranslate2 Whisper),
+or whisper.cpp / OpenVINO for CPU-only workers.
 Refactored from the original transcribe_audio.py script.
 """
 
-import ssl
-import whisper
 import logging
 import os
+import ctranslate2
 from dotenv import load_dotenv
+from faster_whisper import BatchedInferencePipeline, WhisperModel, decode_audio
+from huggingface_hub.utils import LocalEntryNotFoundError
 
 logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
 
-# Bypass SSL certificate verification for model download
-ssl._create_default_https_context = ssl._create_unverified_context
+# Inference backend: "faster-whisper" (default), "cpp" (whisper.cpp through
+# the optional pywhispercpp package, which uses quantized ggml models) or
+# "openvino" (the optional openvino-genai package, for Intel CPUs/iGPUs/NPUs)
+WHISPER_BACKEND = os.getenv('WHISPER_BACKEND', 'faster-whisper')
+
+# OpenVINO backend: directory of the exported OpenVINO Whisper model, target
+# device, and where compiled models are cached so worker restarts skip compilation
+OPENVINO_MODEL_DIR = os.getenv('OPENVINO_MODEL_DIR', '/models/whisper-openvino')
+OPENVINO_DEVICE = os.getenv('OPENVINO_DEVICE', 'CPU')
+OPENVINO_CACHE_DIR = os.getenv('OPENVINO_CACHE_DIR', '/var/cache/ov_whisper')
+
+# Directory holding downloaded Whisper models. The Docker image fills it at
+# build time, so when it is set workers load from disk without hitting the
+# network (models that weren't prefetched are still downloaded on first use).
+WHISPER_MODEL_DIR = os.getenv('WHISPER_MODEL_DIR') or None
+
+# CTranslate2 device ("cpu", "cuda" or "auto") and compute type for the model.
+# "auto" picks the fastest option the hardware supports; see _select_device_and_compute()
+WHISPER_DEVICE = os.getenv('WHISPER_DEVICE', 'auto')
+WHISPER_COMPUTE_TYPE = os.getenv('WHISPER_COMPUTE_TYPE', 'auto')
+
+# Compute types to try for each device, fastest first. GPUs without int8
+# support still run half precision, and only fall back to float32 when
+# float16 isn't supported either.
+COMPUTE_TYPE_PREFERENCE = {
+    'cuda': ('int8_float16', 'float16', 'float32'),
+    'cpu': ('int8', 'float32'),
+}
+
+# Non-speech gaps at least this long are dropped by the VAD filter before decoding
+VAD_MIN_SILENCE_MS = int(os.getenv('WHISPER_VAD_MIN_SILENCE_MS', '500'))
+
+# Decoding options. Greedy search at a single temperature, without conditioning
+# on the previous window, keeps the decoder cost to one pass per segment.
+WHISPER_BEAM_SIZE = int(os.getenv('WHISPER_BEAM_SIZE', '1'))
+WHISPER_TEMPERATURE = float(os.getenv('WHISPER_TEMPERATURE', '0.0'))
+
+# Language code (e.g. "en") used when a request doesn't give one; setting it
+# skips language detection. Empty means detect.
+WHISPER_LANGUAGE = os.getenv('WHISPER_LANGUAGE') or None
+
+# Number of speech chunks decoded together in one forward pass (0 decodes them
+# one after another). Batching mainly pays off on GPU.
+WHISPER_BATCH_SIZE = int(os.getenv('WHISPER_BATCH_SIZE', '0'))
+
+# Transcriber shared by every task run in this process; see get_transcriber()
+_TRANSCRIBER = None
 
 
 class AudioTranscriber:
-    """Handles audio transcription using OpenAI Whisper."""
+    """Handles audio transcription using faster-whisper or whisper.cpp."""
 
-    def __init__(self, model_name=None):
+    def __init__(self, model_name=None, backend=None):
         """
         Initialize the transcriber with a Whisper model.
 
         Args:
             model_name: Whisper model size (tiny, base, small, medium, large)
                        Defaults to environment variable or "tiny"
+            backend: "faster-whisper", "cpp" or "openvino"
+                     Defaults to environment variable or "faster-whisper"
         """
         if model_name is None:
             model_name = os.getenv('WHISPER_MODEL', 'tiny')
 
         self.model_name = model_name
+        self.backend = backend or WHISPER_BACKEND
         self.model = None
-        logger.info(f"Initializing AudioTranscriber with model: {model_name}")
+        self.pipeline = None
+        logger.info(f"Initializing AudioTranscriber with model: {model_name} ({self.backend})")
 
     def load_model(self):
         """Load the Whisper model."""
@@ -45,19 +96,88 @@ class AudioTranscriber:
 
         try:
             logger.info(f"Loading Whisper model '{self.model_name}'...")
-            self.model = whisper.load_model(self.model_name)
+            if self.backend == 'cpp':
+                from pywhispercpp.model import Model
+
+                self.model = Model(
+                    self.model_name,
+                    models_dir=WHISPER_MODEL_DIR,
+                    n_threads=os.cpu_count(),
+                    redirect_whispercpp_logs_to=None,
+                )
+            elif self.backend == 'openvino':
+                import openvino_genai
+
+                logger.info(f"Using OpenVINO device '{OPENVINO_DEVICE}' with cache '{OPENVINO_CACHE_DIR}'")
+                self.model = openvino_genai.WhisperPipeline(
+                    OPENVINO_MODEL_DIR, OPENVINO_DEVICE, CACHE_DIR=OPENVINO_CACHE_DIR
+                )
+            else:
+                device, compute_type = self._select_device_and_compute()
+                logger.info(f"Using device '{device}' with compute type '{compute_type}'")
+                self.model = self._load_faster_whisper(device, compute_type)
+                if WHISPER_BATCH_SIZE > 0:
+                    logger.info(f"Using batched inference with batch size {WHISPER_BATCH_SIZE}")
+                    self.pipeline = BatchedInferencePipeline(model=self.model)
             logger.info("Model loaded successfully")
             return True
         except Exception as e:
             logger.error(f"Error loading model: {e}")
             return False
 
-    def transcribe(self, audio_file_path):
+    def _load_faster_whisper(self, device, compute_type):
+        """
+        Load the faster-whisper model, preferring the copy in WHISPER_MODEL_DIR.
+
+        The Docker image only prefetches the model named by its WHISPER_MODEL
+        build arg, so a different model is downloaded instead of failing.
+
+        Returns:
+            WhisperModel instance
+        """
+        options = {'device': device, 'compute_type': compute_type, 'download_root': WHISPER_MODEL_DIR}
+        if WHISPER_MODEL_DIR is not None:
+            try:
+                return WhisperModel(self.model_name, local_files_only=True, **options)
+            except LocalEntryNotFoundError:
+                logger.warning(
+                    f"Model '{self.model_name}' is not in {WHISPER_MODEL_DIR}, downloading it. "
+                    f"Build the image with --build-arg WHISPER_MODEL={self.model_name} to prefetch it."
+                )
+        return WhisperModel(self.model_name, **options)
+
+    def _select_device_and_compute(self):
+        """
+        Choose the device and compute type for faster-whisper.
+
+        WHISPER_DEVICE and WHISPER_COMPUTE_TYPE are used as-is unless set to "auto".
+
+        Returns:
+            Tuple of (device, compute_type)
+        """
+        device = WHISPER_DEVICE
+        if device == 'auto':
+            device = 'cuda' if ctranslate2.get_cuda_device_count() > 0 else 'cpu'
+
+        compute_type = WHISPER_COMPUTE_TYPE
+        if compute_type == 'auto':
+            supported = ctranslate2.get_supported_compute_types(device)
+            compute_type = next(
+                (candidate for candidate in COMPUTE_TYPE_PREFERENCE[device] if candidate in supported),
+                'default',
+            )
+
+        return device, compute_type
+
+    def transcribe(self, audio, language=None):
         """
         Transcribe an audio file.
 
         Args:
-            audio_file_path: Path to the audio file
+            audio: Path to the audio file, or a float32 numpy array of
+                   16 kHz mono samples (see fetch_audio_as_array)
+            language: Spoken language code, e.g. "en" (defaults to
+                      WHISPER_LANGUAGE; detected when neither is set)
 
         Returns:
             Dictionary with transcription results or None if error
@@ -71,28 +191,91 @@ class AudioTranscriber:
             logger.error("Model not loaded. Call load_model() first.")
             return None
 
-        if not os.path.exists(audio_file_path):
-            logger.error(f"Audio file not found: {audio_file_path}")
+        is_path = isinstance(audio, str)
+        if is_path and not os.path.exists(audio):
+            logger.error(f"Audio file not found: {audio}")
             return None
 
         try:
-            logger.info(f"Transcribing {audio_file_path}...")
-            result = self.model.transcribe(audio_file_path)
+            if is_path:
+                logger.info(f"Transcribing {audio}...")
+            else:
+                logger.info(f"Transcribing {len(audio) / 16000:.1f}s of in-memory audio...")
+
+            language = language or WHISPER_LANGUAGE
+            if self.backend == 'cpp':
+                text, language, segments = self._transcribe_cpp(audio, language)
+            elif self.backend == 'openvino':
+                text, language, segments = self._transcribe_openvino(audio, language)
+            else:
+                text, language, segments = self._transcribe_faster_whisper(audio, language)
 
             logger.info("Transcription completed successfully")
-            logger.info(f"Detected language: {result.get('language', 'unknown')}")
-            logger.info(f"Transcript length: {len(result['text'])} characters")
+            logger.info(f"Detected language: {language}")
+            logger.info(f"Transcript length: {len(text)} characters")
 
             return {
-                'text': result['text'],
-                'language': result.get('language', 'unknown'),
-                'segments': result.get('segments', []),
+                'text': text,
+                'language': language,
+                'segments': segments,
             }
 
         except Exception as e:
             logger.error(f"Error during transcription: {e}")
             return None
 
+    def _transcribe_faster_whisper(self, audio, language):
+        """Run faster-whisper and return (text, language, segments)."""
+        options = {
+            'language': language,
+            'beam_size': WHISPER_BEAM_SIZE,
+            'best_of': 1,
+            'temperature': WHISPER_TEMPERATURE,
+            'condition_on_previous_text': False,
+            'no_speech_threshold': 0.6,
+            'compression_ratio_threshold': 2.4,
+            'vad_filter': True,
+            'vad_parameters': {'min_silence_duration_ms': VAD_MIN_SILENCE_MS},
+        }
+        if self.pipeline is not None:
+            segments_iter, info = self.pipeline.transcribe(audio, batch_size=WHISPER_BATCH_SIZE, **options)
+        else:
+            segments_iter, info = self.model.transcribe(audio, **options)
+
+        # Segments are decoded lazily; consume them into the openai-whisper result shape
+        segments = [
+            {'id': i, 'start': segment.start, 'end': segment.end, 'text': segment.text}
+            for i, segment in enumerate(segments_iter)
+        ]
+        text = ''.join(segment['text'] for segment in segments)
+        return text, info.language or 'unknown', segments
+
+    def _transcribe_cpp(self, audio, language):
+        """Run whisper.cpp and return (text, language, segments)."""
+        options = {'language': language} if language else {}
+
+        # whisper.cpp reports timestamps in 10 ms units and does not expose the detected language
+        segments = [
+            {'id': i, 'start': segment.t0 / 100, 'end': segment.t1 / 100, 'text': segment.text}
+            for i, segment in enumerate(self.model.transcribe(audio, **options))
+        ]
+        text = ' '.join(segment['text'] for segment in segments)
+        return text, language or 'unknown', segments
+
+    def _transcribe_openvino(self, audio, language):
+        """Run the OpenVINO Whisper pipeline and return (text, language, segments)."""
+        # The pipeline takes raw 16 kHz mono samples rather than a file path
+        if isinstance(audio, str):
+            audio = decode_audio(audio, sampling_rate=16000)
+        options = {'language': f"<|{language}|>"} if language else {}
+        result = self.model.generate(audio.tolist(), return_timestamps=True, **options)
+
+        segments = [
+            {'id': i, 'start': chunk.start_ts, 'end': chunk.end_ts, 'text': chunk.text}
+            for i, chunk in enumerate(result.chunks or [])
+        ]
+        return result.texts[0], language or 'unknown', segments
+
     def format_transcript_markdown(self, transcription_result, audio_filename):
         """
         Format transcription results as Markdown.
@@ -107,19 +290,20 @@ class AudioTranscriber:
         if not transcription_result:
             return "Transcription failed"
 
-        md_output = f"# Transcript: {audio_filename}\n\n"
-        md_output += f"**Language:** {transcription_result['language']}\n\n"
-        md_output += "## Full Transcription\n\n"
-        md_output += transcription_result['text']
-        md_output += "\n\n## Detailed Segments\n\n"
-
-        for i, segment in enumerate(transcription_result.get('segments', []), 1):
-            start = segment.get('start', 0)
-            end = segment.get('end', 0)
-            text = segment.get('text', '')
-            md_output += f"**Segment {i}** ({start:.2f}s - {end:.2f}s): {text}\n\n"
-
-        return md_output
+        parts = [
+            f"# Transcript: {audio_filename}\n\n",
+            f"**Language:** {transcription_result['language']}\n\n",
+            "## Full Transcription\n\n",
+            transcription_result['text'],
+            "\n\n## Detailed Segments\n\n",
+        ]
+        parts.extend(
+            f"**Segment {i}** ({segment.get('start', 0):.2f}s - {segment.get('end', 0):.2f}s): "
+            f"{segment.get('text', '')}\n\n"
+            for i, segment in enumerate(transcription_result.get('segments', []), 1)
+        )
+
+        return ''.join(parts)
 
     def get_full_transcript_text(self, transcription_result):
         """
@@ -136,6 +320,21 @@ class AudioTranscriber:
         return transcription_result.get('text', '')
 
 
+def get_transcriber():
+    """
+    Return this process's transcriber, loading the Whisper model on first use.
+
+    Celery workers call this from worker_process_init (see celery.py), so each
+    worker process holds a single loaded model that every task reuses.
+    """
+    global _TRANSCRIBER
+    if _TRANSCRIBER is None:
+        transcriber = AudioTranscriber()
+        transcriber.load_model()
+        _TRANSCRIBER = transcriber
+    return _TRANSCRIBER
+
+
 if __name__ == "__main__":
     # Test the transcriber
     logging.basicConfig(level=logging.INFO)
@@ -2,18 +2,39 @@
 API views for webhook endpoints.
 """
 
+import hmac
+import json
 import logging
+import redis
+from celery import current_app
+from celery import states
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-from rest_framework.decorators import api_view
-from rest_framework.response import Response
-from rest_framework import status
-from .tasks import process_transcription_task
+from .tasks import queue_transcription
 from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
+# Webhook secret as bytes for hmac.compare_digest (empty disables the check)
+_WEBHOOK_SECRET = (settings.WEBHOOK_SECRET or '').encode()
+
+# Broker connection and queues used to measure the backlog for MAX_INFLIGHT
+_BROKER = redis.Redis.from_url(settings.CELERY_BROKER_URL)
+_TASK_QUEUES = sorted({route['queue'] for route in settings.CELERY_TASK_ROUTES.values()})
+# Hash where kombu's Redis transport keeps delivered but unacknowledged messages
+_UNACKED_KEY = settings.CELERY_BROKER_TRANSPORT_OPTIONS.get('unacked_key', 'unacked')
+
+
+def _queue_depth():
+    """Return the number of tasks queued or reserved by workers but not yet finished."""
+    pipe = _BROKER.pipeline(transaction=False)
+    for queue in _TASK_QUEUES:
+        pipe.llen(queue)
+    # Messages prefetched by workers leave the queue lists but stay in this hash until acked
+    pipe.hlen(_UNACKED_KEY)
+    return sum(pipe.execute())
+
 
 @require_http_methods(["GET"])
 def health_check(request):
@@ -28,7 +49,7 @@ def health_check(request):
 
 
 @csrf_exempt
-@api_view(['POST'])
+@require_http_methods(["POST"])
 def transcribe_webhook(request):
     """
     Webhook endpoint to receive transcription requests from Coda.
@@ -36,47 +57,74 @@ def transcribe_webhook(request):
     Expected payload:
     {
         "row_id": "i-abc123",  # Coda row ID
-        "audio_url": "https://drive.google.com/..."  # Optional, can fetch from row
+        "audio_url": "https://drive.google.com/...",  # Optional, can fetch from row
+        "language": "en"  # Optional, skips language detection
     }
     """
     try:
-        data = request.data
+        # Validate webhook secret if configured, before the body is parsed
+        webhook_secret = request.headers.get('X-Webhook-Secret') or ''
+        if _WEBHOOK_SECRET and not hmac.compare_digest(_WEBHOOK_SECRET, webhook_secret.encode()):
+            logger.warning(f"Invalid webhook secret from {request.META.get('REMOTE_ADDR')}")
+            return JsonResponse({
+                'error': 'Invalid webhook secret'
+            }, status=401)
+
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            data = None
+
+        if not isinstance(data, dict):
+            return JsonResponse({
+                'error': 'Request body must be a JSON object'
+            }, status=400)
+
         logger.info(f"Received webhook request: {data}")
 
         # Get row ID from payload
         row_id = data.get('row_id')
         audio_url = data.get('audio_url')  # Optional
+        language = data.get('language')  # Optional
 
         if not row_id:
-            return Response({
+            return JsonResponse({
                 'error': 'Missing row_id in request'
-            }, status=status.HTTP_400_BAD_REQUEST)
-
-        # Validate webhook secret if configured
-        webhook_secret = request.headers.get('X-Webhook-Secret')
-        if settings.WEBHOOK_SECRET and webhook_secret != settings.WEBHOOK_SECRET:
-            logger.warning(f"Invalid webhook secret from {request.META.get('REMOTE_ADDR')}")
-            return Response({
-                'error': 'Invalid webhook secret'
-            }, status=status.HTTP_401_UNAUTHORIZED)
+            }, status=400)
+
+        # Shed load while the workers are backed up, rather than queueing work that would time out
+        if settings.MAX_INFLIGHT:
+            try:
+                queue_depth = _queue_depth()
+            except redis.RedisError as e:
+                logger.error(f"Error reading queue depth: {e}")
+                queue_depth = 0
+
+            if queue_depth >= settings.MAX_INFLIGHT:
+                logger.warning(f"Rejecting webhook for row {row_id}: {queue_depth} tasks queued")
+                response = JsonResponse({
+                    'error': 'Too many transcriptions in progress, retry later'
+                }, status=429)
+                response['Retry-After'] = '30'
+                return response
 
         # Queue the transcription task
-        task = process_transcription_task.delay(row_id, audio_url)
+        task = queue_transcription(row_id, audio_url, language)
 
         logger.info(f"Queued transcription task {task.id} for row {row_id}")
 
-        return Response({
+        return JsonResponse({
             'status': 'queued',
             'task_id': task.id,
             'row_id': row_id,
             'message': 'Transcription task has been queued'
-        }, status=status.HTTP_202_ACCEPTED)
+        }, status=202)
 
     except Exception as e:
         logger.error(f"Error in transcribe_webhook: {e}", exc_info=True)
-        return Response({
+        return JsonResponse({
             'error': str(e)
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        }, status=500)
 
 
 @require_http_methods(["GET"])
@@ -84,30 +132,36 @@ def task_status(request, task_id):
     """
     Check the status of a transcription task.
     """
-    from celery.result import AsyncResult
-
     try:
-        task = AsyncResult(task_id)
+        # Read state and result with a single result-backend lookup
+        meta = current_app.backend.get_task_meta(task_id)
+        state = meta['status']
 
         response_data = {
             'task_id': task_id,
-            'status': task.state,
+            'status': state,
         }
 
-        if task.state == 'PENDING':
+        if state == 'PENDING':
             response_data['message'] = 'Task is waiting to be processed'
-        elif task.state == 'STARTED':
+        elif state == 'STARTED':
             response_data['message'] = 'Task is being processed'
-        elif task.state == 'SUCCESS':
+        elif state == 'SUCCESS':
             response_data['message'] = 'Task completed successfully'
-            response_data['result'] = task.result
-        elif task.state == 'FAILURE':
+            response_data['result'] = meta.get('result')
+        elif state == 'FAILURE':
             response_data['message'] = 'Task failed'
-            response_data['error'] = str(task.info)
+            response_data['error'] = str(meta.get('result'))
         else:
-            response_data['message'] = f'Task state: {task.state}'
+            response_data['message'] = f'Task state: {state}'
+
+        response = JsonResponse(response_data)
+
+        # Finished tasks no longer change, so let clients skip some polls
+        if state in states.READY_STATES:
+            response['Cache-Control'] = 'public, max-age=1'
 
-        return JsonResponse(response_data)
+        return response
 
     except Exception as e:
         logger.error(f"Error checking task status: {e}")
@@ -3,11 +3,20 @@ Celery configuration for background tasks.
 """
 
 import os
+import logging
+import lz4.frame
 from celery import Celery
+from celery.signals import worker_process_init
+from kombu import compression
+
+logger = logging.getLogger(__name__)
 
 # Set the default Django settings module
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'transcription_service.settings')
 
+# kombu has no built-in lz4 codec; register one for CELERY_*_COMPRESSION
+compression.register(lz4.frame.compress, lz4.frame.decompress, 'application/x-lz4', aliases=['lz4'])
+
 app = Celery('transcription_service')
 
 # Load configuration from Django settings
@@ -16,6 +25,24 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 # Auto-discover tasks in all installed apps
 app.autodiscover_tasks()
 
+# Queue that runs Whisper; see CELERY_TASK_ROUTES in settings
+TRANSCRIBE_QUEUE = 'gpu'
+
+
+@worker_process_init.connect
+def init_transcriber(**kwargs):
+    """Load the Whisper model as soon as a transcription worker process starts."""
+    consume_from = app.amqp.queues.consume_from
+    if consume_from and TRANSCRIBE_QUEUE not in consume_from:
+        return
+
+    try:
+        from api.transcriber import get_transcriber
+
+        get_transcriber()
+    except Exception as e:
+        logger.error(f"Error initializing transcriber: {e}", exc_info=True)
+
 
 @app.task(bind=True, ignore_result=True)
 def debug_task(self):
@@ -28,7 +28,6 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'rest_framework',
     'corsheaders',
     'api',
 ]
@@ -104,23 +103,43 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True  # For development; restrict in production
 
-# REST Framework settings
-REST_FRAMEWORK = {
-    'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
-    ],
-    'DEFAULT_PARSER_CLASSES': [
-        'rest_framework.parsers.JSONParser',
-    ],
-}
-
 # Celery Configuration
 CELERY_BROKER_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
-CELERY_ACCEPT_CONTENT = ['json']
-CELERY_TASK_SERIALIZER = 'json'
-CELERY_RESULT_SERIALIZER = 'json'
+# Broker connections kept open per process for publishing tasks
+CELERY_BROKER_POOL_LIMIT = 20
+# Open a pooled broker connection when the web app starts instead of on the first webhook
+WARM_BROKER_POOL = os.getenv('WARM_BROKER_POOL', 'False') == 'True'
+# msgpack is smaller and faster to encode than JSON; JSON is still accepted so
+# messages queued before a deploy are processed
+CELERY_ACCEPT_CONTENT = ['msgpack', 'json']
+CELERY_TASK_SERIALIZER = 'msgpack'
+CELERY_RESULT_SERIALIZER = 'msgpack'
+# Task messages carry the transcript from transcribe_audio_task to update_row_task;
+# lz4 (registered in celery.py) shrinks them cheaply
+CELERY_TASK_COMPRESSION = 'lz4'
 CELERY_TIMEZONE = 'UTC'
+# Drop task results from Redis after an hour; clients poll status shortly after queueing
+CELERY_RESULT_EXPIRES = 3600
+# Reserve one task at a time and acknowledge it only once it has finished, so a
+# transcription worker never holds queued work it can't start (or loses it on a crash)
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_TASK_ACKS_LATE = True
+# Longest a single transcription may run, in seconds (soft limit; the hard kill follows a minute later)
+TRANSCRIBE_TIME_LIMIT = int(os.getenv('TRANSCRIBE_TIME_LIMIT', '7200'))
+# Redis redelivers unacked messages after the visibility timeout (1 hour by default),
+# so with late acks it must outlast the longest task or long transcriptions run twice
+CELERY_BROKER_TRANSPORT_OPTIONS = {'visibility_timeout': TRANSCRIBE_TIME_LIMIT + 3600}
+# Recycle prefork children periodically to release memory leaked by inference
+CELERY_WORKER_MAX_TASKS_PER_CHILD = 100
+
+# Download and Coda updates go to the 'cpu' queue and Whisper to the 'gpu'
+# queue, so GPU nodes only run inference and CPU nodes handle everything else
+CELERY_TASK_ROUTES = {
+    '*.download_audio_task': {'queue': 'cpu'},
+    '*.transcribe_audio_task': {'queue': 'gpu'},
+    '*.update_row_task': {'queue': 'cpu'},
+}
 
 # Coda Configuration
 CODA_API_KEY = os.getenv('CODA_API_KEY')
@@ -138,5 +157,13 @@ COLUMN_PROCESSED_DATE = os.getenv('COLUMN_PROCESSED_DATE', 'Processed Date')
 WHISPER_MODEL = os.getenv('WHISPER_MODEL', 'tiny')
 TEMP_DOWNLOAD_DIR = os.getenv('TEMP_DOWNLOAD_DIR', '/tmp/audio')
 
+# Stream audio through ffmpeg straight into memory on the transcription worker
+# instead of downloading it to TEMP_DOWNLOAD_DIR first
+STREAM_AUDIO = os.getenv('STREAM_AUDIO', 'False') == 'True'
+
 # Webhook Security (optional - add a secret token for webhook authentication)
 WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+
+# Reject webhooks with 429 once this many tasks are waiting in the Celery queues
+# (0 disables the limit)
+MAX_INFLIGHT = int(os.getenv('MAX_INFLIGHT', '0'))